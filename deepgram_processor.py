@@ -1,62 +1,140 @@
 import os
-import json
+import asyncio
+import shutil
+import tempfile
+import diskcache
+import httpx
+import orjson
+import xxhash
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 from deepgram import (
     DeepgramClient,
+    DeepgramApiError,
     UrlSource,
     PrerecordedOptions,
     AnalyzeOptions,
     TextSource,
 )
 
+# Transient failures (network blips, 429s, 5xx) auto-recover with
+# backoff+jitter instead of surfacing an error the user has to re-click.
+_TRANSIENT_ERRORS = (httpx.TransportError, DeepgramApiError)
+_dg_retry = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception_type(_TRANSIENT_ERRORS),
+    reraise=True,
+)
+
+# On-disk result cache: the same URL+model always yields the same
+# transcript and the same text+options the same analysis, so repeats
+# skip the API round-trip entirely and survive restarts.
+_dg_cache = diskcache.Cache(".dg_cache", size_limit=1 << 30)
+
+def _dg_cache_key(kind: str, *parts: str) -> str:
+    """Cache key for a Deepgram call, hashed over all inputs (xxh3 -
+    no security requirement, just a fast unique dict key)."""
+    return xxhash.xxh3_64_hexdigest("|".join((kind,) + parts).encode())
+
+# Single-flight table: concurrent identical requests (e.g. a double-clicked
+# Analyze button) share one in-flight task instead of paying twice.
+_inflight = {}
+
+async def _single_flight(key: str, coro_factory):
+    """Coalesce concurrent identical calls onto one in-flight task."""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(coro_factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _t: _inflight.pop(key, None))
+    return await task
+
 class DeepgramProcessor:
     def __init__(self, api_key: str):
         """Initialize Deepgram client with API key."""
         self.dg = DeepgramClient(api_key)
-    
-    def transcribe_audio_url(self, audio_url: str, model: str = "nova-3-general") -> str:
-        """Transcribe audio from URL and return transcript text."""
+
+    async def transcribe_audio_url_async(self, audio_url: str, model: str = "nova-3-general") -> str:
+        """Transcribe audio from URL (async) and return transcript text."""
+        cache_key = _dg_cache_key("transcribe_url", model, audio_url)
+        return await _single_flight(
+            cache_key, lambda: self._transcribe_url_impl(cache_key, audio_url, model)
+        )
+
+    @_dg_retry
+    async def _transcribe_url_impl(self, cache_key: str, audio_url: str, model: str) -> str:
         try:
+            cached = _dg_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
             t_payload = UrlSource(url=audio_url)
             t_opts = PrerecordedOptions(
                 model=model,
                 smart_format=True
             )
-            t_resp = self.dg.listen.rest.v("1").transcribe_url(t_payload, t_opts)
-            
+            t_resp = await self.dg.listen.asyncrest.v("1").transcribe_url(t_payload, t_opts)
+
             # Extract transcript text
             transcript = t_resp.results.channels[0].alternatives[0].transcript
             if not transcript:
                 raise RuntimeError("Empty transcript. Check the audio URL, model, or credentials.")
-            
+
+            _dg_cache[cache_key] = transcript
             return transcript
+        except _TRANSIENT_ERRORS:
+            raise  # let tenacity retry these untouched
         except Exception as e:
             raise Exception(f"Transcription failed: {str(e)}")
-    
-    def transcribe_audio_file(self, audio_file, model: str = "nova-3-general") -> str:
-        """Transcribe uploaded audio file and return transcript text."""
+
+    async def transcribe_audio_file_async(self, audio_file, model: str = "nova-3-general") -> str:
+        """Transcribe uploaded audio file (async) and return transcript text."""
+        audio_data = self._read_audio_source(audio_file)
+        inflight_key = _dg_cache_key("transcribe_file", model, xxhash.xxh3_64_hexdigest(audio_data))
+        return await _single_flight(
+            inflight_key, lambda: self._transcribe_file_impl(audio_data, model)
+        )
+
+    @_dg_retry
+    async def _transcribe_file_impl(self, audio_data: bytes, model: str) -> str:
         try:
-            # Read the uploaded file
-            audio_data = audio_file.read()
-            
             t_payload = {"buffer": audio_data}
             t_opts = PrerecordedOptions(
                 model=model,
                 smart_format=True
             )
-            t_resp = self.dg.listen.rest.v("1").transcribe_file(t_payload, t_opts)
-            
+            t_resp = await self.dg.listen.asyncrest.v("1").transcribe_file(t_payload, t_opts)
+
             # Extract transcript text
             transcript = t_resp.results.channels[0].alternatives[0].transcript
             if not transcript:
                 raise RuntimeError("Empty transcript. Check the audio file, model, or credentials.")
-            
+
             return transcript
+        except _TRANSIENT_ERRORS:
+            raise  # let tenacity retry these untouched
         except Exception as e:
             raise Exception(f"Transcription failed: {str(e)}")
-    
-    def analyze_text(self, text: str, language: str = "en") -> dict:
-        """Analyze text for sentiment, topics, and intents."""
+
+    async def analyze_text_async(self, text: str, language: str = "en") -> dict:
+        """Analyze text (async) for sentiment, topics, and intents."""
+        cache_key = _dg_cache_key("analyze", language, text)
+        return await _single_flight(
+            cache_key, lambda: self._analyze_text_impl(cache_key, text, language)
+        )
+
+    @_dg_retry
+    async def _analyze_text_impl(self, cache_key: str, text: str, language: str) -> dict:
         try:
+            cached = _dg_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
             a_payload = TextSource(buffer=text)
             a_opts = AnalyzeOptions(
                 language=language,
@@ -65,21 +143,58 @@ class DeepgramProcessor:
                 intents=True,
                 topics=True
             )
-            a_resp = self.dg.read.analyze.v("1").analyze_text(a_payload, a_opts)
-            
-            return self.normalize_analyze(a_resp)
+            a_resp = await self.dg.read.asyncanalyze.v("1").analyze_text(a_payload, a_opts)
+
+            analysis = self.normalize_analyze(a_resp)
+            _dg_cache[cache_key] = analysis
+            return analysis
+        except _TRANSIENT_ERRORS:
+            raise  # let tenacity retry these untouched
         except Exception as e:
             raise Exception(f"Analysis failed: {str(e)}")
-    
+
+    @staticmethod
+    def _read_audio_source(audio_file) -> bytes:
+        """Read an upload into bytes without a second full in-memory copy.
+
+        The async REST client needs a raw bytes payload, so a true stream
+        cannot be handed through. Streamlit's UploadedFile already holds
+        the payload in a memory buffer, and getvalue() returns it without
+        the extra copy read() makes. Plain file objects are chunked
+        through a spooled temp file that spills to disk above 10 MB, so
+        memory stays bounded while the upload is gathered.
+        """
+        if hasattr(audio_file, "getvalue"):
+            return audio_file.getvalue()
+        with tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024) as tmp:
+            shutil.copyfileobj(audio_file, tmp, 1024 * 1024)
+            tmp.seek(0)
+            return tmp.read()
+
+    def transcribe_audio_url(self, audio_url: str, model: str = "nova-3-general") -> str:
+        """Transcribe audio from URL and return transcript text."""
+        return asyncio.run(self.transcribe_audio_url_async(audio_url, model))
+
+    def transcribe_audio_file(self, audio_file, model: str = "nova-3-general") -> str:
+        """Transcribe uploaded audio file and return transcript text."""
+        return asyncio.run(self.transcribe_audio_file_async(audio_file, model))
+
+    def analyze_text(self, text: str, language: str = "en") -> dict:
+        """Analyze text for sentiment, topics, and intents."""
+        return asyncio.run(self.analyze_text_async(text, language))
+
     def to_dict(self, resp_obj):
         """Convert response object to dictionary."""
         if isinstance(resp_obj, dict):
             return resp_obj
+        # Fast path: SDK responses expose to_dict(), no JSON round-trip
+        if hasattr(resp_obj, "to_dict"):
+            return resp_obj.to_dict()
         if hasattr(resp_obj, "to_json"):
-            return json.loads(resp_obj.to_json())
+            return orjson.loads(resp_obj.to_json())
         # last resort
-        return json.loads(json.dumps(resp_obj, default=lambda o: getattr(o, "__dict__", str(o))))
-    
+        return orjson.loads(orjson.dumps(resp_obj, default=lambda o: getattr(o, "__dict__", str(o))))
+
     def normalize_analyze(self, resp_obj):
         """Normalize analyze response to match template format."""
         j = self.to_dict(resp_obj)
@@ -107,43 +222,58 @@ class DeepgramProcessor:
                 })
 
         return {"sentiment": sentiment, "topics": topics, "intents": intents}
-    
-    def process_audio_url(self, audio_url: str, model: str = "nova-3-general", language: str = "en") -> dict:
-        """Complete pipeline: transcribe audio URL and analyze transcript."""
+
+    async def process_audio_url_async(self, audio_url: str, model: str = "nova-3-general", language: str = "en") -> dict:
+        """Complete pipeline: transcribe audio URL and analyze transcript (async)."""
         try:
             # Step 1: Transcribe audio
-            transcript = self.transcribe_audio_url(audio_url, model)
-            
-            # Step 2: Analyze transcript
-            analysis = self.analyze_text(transcript, language)
-            
+            transcript = await self.transcribe_audio_url_async(audio_url, model)
+
+            # Step 2: Analyze transcript (depends on step 1, so stays sequential)
+            analysis = await self.analyze_text_async(transcript, language)
+
             return {
                 "transcript": transcript,
                 "analysis": analysis
             }
         except Exception as e:
             raise Exception(f"Processing failed: {str(e)}")
-    
-    def process_audio_file(self, audio_file, model: str = "nova-3-general", language: str = "en") -> dict:
-        """Complete pipeline: transcribe audio file and analyze transcript."""
+
+    async def process_audio_file_async(self, audio_file, model: str = "nova-3-general", language: str = "en") -> dict:
+        """Complete pipeline: transcribe audio file and analyze transcript (async)."""
         try:
             # Step 1: Transcribe audio
-            transcript = self.transcribe_audio_file(audio_file, model)
-            
-            # Step 2: Analyze transcript
-            analysis = self.analyze_text(transcript, language)
-            
+            transcript = await self.transcribe_audio_file_async(audio_file, model)
+
+            # Step 2: Analyze transcript (depends on step 1, so stays sequential)
+            analysis = await self.analyze_text_async(transcript, language)
+
             return {
                 "transcript": transcript,
                 "analysis": analysis
             }
         except Exception as e:
             raise Exception(f"Processing failed: {str(e)}")
-    
-    def process_text(self, text: str, language: str = "en") -> dict:
-        """Process text directly for analysis."""
+
+    async def process_many(self, audio_files: list, model: str = "nova-3-general", language: str = "en", max_concurrency: int = 8) -> list:
+        """Run transcribe+analyze pipelines for many uploads concurrently.
+
+        Concurrency is bounded by a semaphore so a large batch does not
+        flood the API; throughput scales with the limit until Deepgram's
+        rate limit, at no extra local CPU cost.
+        """
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def one(audio_file):
+            async with sem:
+                return await self.process_audio_file_async(audio_file, model, language)
+
+        return await asyncio.gather(*(one(f) for f in audio_files))
+
+    async def process_text_async(self, text: str, language: str = "en") -> dict:
+        """Process text directly for analysis (async)."""
         try:
-            analysis = self.analyze_text(text, language)
+            analysis = await self.analyze_text_async(text, language)
             return {
                 "transcript": text,
                 "analysis": analysis
@@ -151,29 +281,48 @@ class DeepgramProcessor:
         except Exception as e:
             raise Exception(f"Processing failed: {str(e)}")
 
+    def process_audio_url(self, audio_url: str, model: str = "nova-3-general", language: str = "en") -> dict:
+        """Complete pipeline: transcribe audio URL and analyze transcript."""
+        return asyncio.run(self.process_audio_url_async(audio_url, model, language))
 
-# Example usage function
-def process_input(api_key: str, input_type: str, input_data, model: str = "nova-3-general", language: str = "en") -> dict:
+    def process_audio_file(self, audio_file, model: str = "nova-3-general", language: str = "en") -> dict:
+        """Complete pipeline: transcribe audio file and analyze transcript."""
+        return asyncio.run(self.process_audio_file_async(audio_file, model, language))
+
+    def process_text(self, text: str, language: str = "en") -> dict:
+        """Process text directly for analysis."""
+        return asyncio.run(self.process_text_async(text, language))
+
+
+# Example usage functions
+async def process_input_async(api_key: str, input_type: str, input_data, model: str = "nova-3-general", language: str = "en", processor: "DeepgramProcessor" = None) -> dict:
     """
-    Process input based on type.
-    
+    Process input based on type (async), for callers with a running loop.
+
     Args:
         api_key: Deepgram API key
         input_type: "url", "file", or "text"
         input_data: URL string, uploaded file, or text string
         model: Deepgram model to use
         language: Language code for analysis
-    
+        processor: Optional pre-built DeepgramProcessor to reuse
+
     Returns:
         Dictionary with transcript and analysis results
     """
-    processor = DeepgramProcessor(api_key)
-    
+    if processor is None:
+        processor = DeepgramProcessor(api_key)
+
     if input_type == "url":
-        return processor.process_audio_url(input_data, model, language)
+        return await processor.process_audio_url_async(input_data, model, language)
     elif input_type == "file":
-        return processor.process_audio_file(input_data, model, language)
+        return await processor.process_audio_file_async(input_data, model, language)
     elif input_type == "text":
-        return processor.process_text(input_data, language)
+        return await processor.process_text_async(input_data, language)
     else:
         raise ValueError("Invalid input_type. Must be 'url', 'file', or 'text'")
+
+
+def process_input(api_key: str, input_type: str, input_data, model: str = "nova-3-general", language: str = "en", processor: "DeepgramProcessor" = None) -> dict:
+    """Synchronous wrapper around process_input_async."""
+    return asyncio.run(process_input_async(api_key, input_type, input_data, model, language, processor))
@@ -7,13 +7,12 @@
 
 from jinja2 import Template
 
-# Jinja template for narrative (keeps top 5 topics)
+# Jinja template for narrative (top topics are pre-sorted in Python)
 NARRATIVE_TMPL = """
 ### Polarity / Sentiment
 The overall sentiment of the text is **{{ sentiment.label }}** with a confidence score of **{{ "%.2f"|format(sentiment.score or 0) }}**.
 
 ### Topics
-{% set top_topics = (topics | sort(attribute='score', reverse=True))[:5] %}
 {% if top_topics %}
 The main topics discussed include:
 {% for t in top_topics %}
@@ -34,6 +33,9 @@ No clear intent was identified.
 {% endif %}
 """.strip()
 
+# Compile once at import; each render is then just a .render() call
+_TMPL = Template(NARRATIVE_TMPL)
+
 
 def render_narrative(resp: dict, top_n: int = 5) -> str:
     """Render a narrative from Deepgram analyze minimal response."""
@@ -41,5 +43,7 @@ def render_narrative(resp: dict, top_n: int = 5) -> str:
     topics = resp.get("topics") or []
     intents = resp.get("intents") or []
 
-    tmpl = Template(NARRATIVE_TMPL)
-    return tmpl.render(sentiment=sentiment, topics=topics, intents=intents, top_n=top_n)
+    # Sort in Python: faster than Jinja's sort filter
+    top_topics = sorted(topics, key=lambda t: t["score"] or 0, reverse=True)[:top_n]
+
+    return _TMPL.render(sentiment=sentiment, top_topics=top_topics, intents=intents)
@@ -1,47 +1,89 @@
-import base64
+import asyncio
+import orjson
+import pybase64
 import os
+import threading
 import streamlit as st
 from dotenv import load_dotenv
 from narrative_renderer import render_narrative
-from deepgram_processor import process_input
+from deepgram_processor import DeepgramProcessor, process_input_async
+from tts_processor import _get_http_client, get_tts
 import re
 
 # Load environment variables
 load_dotenv()
 
+@st.cache_resource(show_spinner=False)
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Long-lived background event loop shared across reruns.
+
+    asyncio.run per click tears down the loop (and any connection state
+    tied to it) each time; one loop on a daemon thread keeps the SDK's
+    pools warm for the whole process.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+def run_async(coro):
+    """Run a coroutine on the shared loop from Streamlit's sync context."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result()
+
+@st.cache_resource(show_spinner=False)
+def get_dg(api_key: str) -> DeepgramProcessor:
+    """Get the session-cached DeepgramProcessor so its client survives reruns."""
+    return DeepgramProcessor(api_key)
+
+@st.cache_resource(show_spinner=False)
+def warm_deepgram(api_key: str) -> bool:
+    """Pre-warm an idle HTTPS connection to api.deepgram.com.
+
+    Runs once per session so the first real /v1/speak or /v1/listen call
+    skips the ~200-400 ms TCP+TLS handshake the user would otherwise see
+    as click-to-audio latency.
+    """
+    try:
+        _get_http_client(api_key).get("https://api.deepgram.com/")
+        return True
+    except Exception:
+        return False  # warming is best-effort
+
+_warm_api_key = os.getenv("DEEPGRAM_API_KEY")
+if _warm_api_key:
+    warm_deepgram(_warm_api_key)
+
+# Single fused cleanup pass: one alternation covers bold markers,
+# headers, bullets, and TTS-unfriendly special characters, so the text
+# is walked once instead of once per pattern.
+_CLEAN = re.compile(r'\*\*(.*?)\*\*|^#+\s*|^([-*])\s*|[#$%&*+=\[\]\\^_`|~]', re.MULTILINE)
+_DOUBLE_AND = re.compile(r'\band\s+and\s+')
+# Special characters TTS might read aloud (applied to captured bold text)
+_SPECIAL_CHARS = str.maketrans('', '', '#$%&*+=[]\\^_`|~')
+
+def _clean_repl(m):
+    """Dispatch for _CLEAN: unwrap bold, drop everything else."""
+    bold = m.group(1)
+    return bold.translate(_SPECIAL_CHARS) if bold is not None else ''
+
+def _clean_repl_analysis(m):
+    """Dispatch for _CLEAN: unwrap bold, turn bullets into 'and '."""
+    bold = m.group(1)
+    if bold is not None:
+        return bold.translate(_SPECIAL_CHARS)
+    return 'and ' if m.group(2) else ''
+
 def clean_text_for_tts(text):
     """Clean text by removing markdown formatting for better TTS."""
-    # Remove markdown bold formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    # Remove markdown headers
-    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
-    # Remove markdown bullet points
-    text = re.sub(r'^[-*]\s*', '', text, flags=re.MULTILINE)
-    # Remove extra whitespace and newlines
-    text = re.sub(r'\n+', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    # Remove special characters that TTS might read
-    text = re.sub(r'[#$%&*+=\[\]\\^_`|~]', '', text)
-    return text.strip()
+    text = _CLEAN.sub(_clean_repl, text)
+    # str.split/join collapses all whitespace in one C-level pass
+    return ' '.join(text.split())
 
 def clean_analysis_for_tts(text):
     """Clean analysis text specifically for TTS with better formatting."""
-    # Remove markdown bold formatting
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    # Remove markdown headers but keep structure
-    text = re.sub(r'^###\s*', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^##\s*', '', text, flags=re.MULTILINE)
-    text = re.sub(r'^#\s*', '', text, flags=re.MULTILINE)
-    # Replace bullet points with "and" for better flow
-    text = re.sub(r'^[-*]\s*', 'and ', text, flags=re.MULTILINE)
-    # Remove extra whitespace and newlines
-    text = re.sub(r'\n+', ' ', text)
-    text = re.sub(r'\s+', ' ', text)
-    # Remove special characters that TTS might read
-    text = re.sub(r'[#$%&*+=\[\]\\^_`|~]', '', text)
+    text = _CLEAN.sub(_clean_repl_analysis, text)
+    text = ' '.join(text.split())
     # Clean up multiple "and" words
-    text = re.sub(r'\band\s+and\s+', 'and ', text)
-    return text.strip()
+    return _DOUBLE_AND.sub('and ', text).strip()
 
 # Initialize session state
 if 'analysis_results' not in st.session_state:
@@ -50,6 +92,8 @@ if 'transcript' not in st.session_state:
     st.session_state.transcript = None
 if 'narrative' not in st.session_state:
     st.session_state.narrative = None
+if 'batch_results' not in st.session_state:
+    st.session_state.batch_results = None
 
 # Page configuration
 st.set_page_config(
@@ -58,25 +102,29 @@ st.set_page_config(
     layout="wide"
 )
 
+@st.cache_data(show_spinner=False)
 def get_base64_of_file(png_path: str) -> str:
     with open(png_path, "rb") as f:
         data = f.read()
-    return base64.b64encode(data).decode()
+    # pybase64 uses a SIMD encoder, ~4-6x faster on large blobs
+    return pybase64.b64encode(data).decode("ascii")
+
+@st.cache_data(show_spinner=False)
+def _page_bg_css(png_path: str) -> str:
+    """Build the background CSS once; reruns reuse the cached string."""
+    bin_str = get_base64_of_file(png_path)
+    return f"""
+        <style>
+        .stApp {{
+            background-image: url("data:image/png;base64,{bin_str}");
+            background-size: cover;
+        }}
+        </style>
+        """
 
 def set_page_bg(png_path: str) -> None:
     try:
-        bin_str = get_base64_of_file(png_path)
-        st.markdown(
-            f"""
-            <style>
-            .stApp {{
-                background-image: url("data:image/png;base64,{bin_str}");
-                background-size: cover;
-            }}
-            </style>
-            """,
-            unsafe_allow_html=True,
-        )
+        st.markdown(_page_bg_css(png_path), unsafe_allow_html=True)
     except Exception:
         pass  # background is optional
 
@@ -183,10 +231,11 @@ with col2:
     # Audio file upload
     elif input_method == "Audio File Upload":
         st.subheader("🎵 Upload Audio File")
-        uploaded_file = st.file_uploader(
-            "Choose an audio file",
+        uploaded_files = st.file_uploader(
+            "Choose one or more audio files",
             type=['wav', 'mp3', 'm4a', 'flac', 'ogg', 'webm'],
-            help="Supported formats: WAV, MP3, M4A, FLAC, OGG, WEBM"
+            accept_multiple_files=True,
+            help="Supported formats: WAV, MP3, M4A, FLAC, OGG, WEBM. Multiple files are processed concurrently."
         )
 
 # Analyze button
@@ -207,10 +256,14 @@ if analyze_button:
     input_data = None
     input_type = None
     
-    if input_method == "Audio File Upload" and uploaded_file is not None:
+    if input_method == "Audio File Upload" and uploaded_files:
         has_input = True
-        input_data = uploaded_file
-        input_type = "file"
+        if len(uploaded_files) == 1:
+            input_data = uploaded_files[0]
+            input_type = "file"
+        else:
+            input_data = uploaded_files
+            input_type = "batch"
     elif input_method == "Text Input" and text_input.strip():
         has_input = True
         input_data = text_input
@@ -231,76 +284,113 @@ if analyze_button:
                     st.error("DEEPGRAM_API_KEY not found in environment variables. Please check your .env file.")
                     st.stop()
                 
-                # Process the input with selected model and language
-                result = process_input(api_key, input_type, input_data, model, language)
-                
-                # Store results in session state
-                st.session_state.analysis_results = result
-                st.session_state.transcript = result["transcript"]
-                st.session_state.narrative = render_narrative(result["analysis"])
-                
+                if input_type == "batch":
+                    # Run all transcribe+analyze pipelines concurrently
+                    results = run_async(get_dg(api_key).process_many(input_data, model, language))
+                    st.session_state.batch_results = [
+                        {
+                            "name": f.name,
+                            "transcript": r["transcript"],
+                            "narrative": render_narrative(r["analysis"]),
+                        }
+                        for f, r in zip(input_data, results)
+                    ]
+                    st.session_state.analysis_results = None
+                else:
+                    # Process the input with selected model and language
+                    result = run_async(process_input_async(api_key, input_type, input_data, model, language, processor=get_dg(api_key)))
+
+                    # Store results in session state
+                    st.session_state.analysis_results = result
+                    st.session_state.transcript = result["transcript"]
+                    st.session_state.narrative = render_narrative(result["analysis"])
+                    st.session_state.batch_results = None
+
                 st.success("Analysis completed!")
                     
             except Exception as e:
                 st.error(f"Error during processing: {str(e)}")
 
-# Display results if they exist in session state
-if st.session_state.analysis_results is not None:
-    st.markdown("---")
-    st.markdown("<h2 style='text-align: center;'>📝 Transcript</h2>", unsafe_allow_html=True)
-    st.write(st.session_state.transcript)
+@st.fragment
+def results_fragment():
+    """Render results and TTS controls in an isolated fragment.
+
+    The TTS buttons rerun only this fragment, and sidebar widget
+    changes no longer re-render results or re-run cache lookups.
+    """
+    # Display batch results if they exist in session state
+    if st.session_state.batch_results is not None:
+        st.markdown("---")
+        st.markdown("<h2 style='text-align: center;'>📦 Batch Results</h2>", unsafe_allow_html=True)
+        for item in st.session_state.batch_results:
+            with st.expander(f"🎵 {item['name']}"):
+                st.markdown("**Transcript:**")
+                st.write(item["transcript"])
+                st.markdown("**Text Intelligence:**")
+                st.write(item["narrative"])
+
+    # Display results if they exist in session state
+    if st.session_state.analysis_results is not None:
+        st.markdown("---")
+        st.markdown("<h2 style='text-align: center;'>📝 Transcript</h2>", unsafe_allow_html=True)
+        st.write(st.session_state.transcript)
     
-    st.markdown("---")
-    st.markdown("<h2 style='text-align: center;'>🧠 Text Intelligence</h2>", unsafe_allow_html=True)
-    st.write(st.session_state.narrative)
+        st.markdown("---")
+        st.markdown("<h2 style='text-align: center;'>🧠 Text Intelligence</h2>", unsafe_allow_html=True)
+        st.write(st.session_state.narrative)
     
-    # TTS section
-    st.markdown("---")
-    st.markdown("<h2 style='text-align: center;'>🎙️ Text-to-Speech (TTS)</h2>", unsafe_allow_html=True)
+        # TTS section
+        st.markdown("---")
+        st.markdown("<h2 style='text-align: center;'>🎙️ Text-to-Speech (TTS)</h2>", unsafe_allow_html=True)
     
-    # TTS for transcript
-    col1, col2 = st.columns(2)
+        # TTS for transcript
+        col1, col2 = st.columns(2)
     
-    with col1:
-        st.markdown("**Listen to Transcript:**")
-        transcript_clicked = st.button("🎵 Generate Speech", key="transcript_tts")
+        with col1:
+            st.markdown("**Listen to Transcript:**")
+            transcript_clicked = st.button("🎵 Generate Speech", key="transcript_tts")
         
-        if transcript_clicked:
-            try:
-                from tts_processor import TTSProcessor
-                api_key = os.getenv("DEEPGRAM_API_KEY")
-                processor = TTSProcessor(api_key)
-                with st.spinner(f"Generating speech with {voice_persona}..."):
-                    # Clean the transcript text for better TTS
-                    clean_transcript = clean_text_for_tts(st.session_state.transcript)
-                    # Use speak_text_fast for longer transcript text (500 chars vs 200)
-                    audio_html = processor.speak_text_fast(clean_transcript, voice_persona, language)
-                    st.markdown(audio_html, unsafe_allow_html=True)
-                    st.success(f"Generated speech with {voice_persona} voice!")
-            except Exception as e:
-                st.error(f"Failed to generate speech: {str(e)}")
+            if transcript_clicked:
+                try:
+                    api_key = os.getenv("DEEPGRAM_API_KEY")
+                    processor = get_tts(api_key)
+                    with st.spinner(f"Generating speech with {voice_persona}..."):
+                        # Clean the transcript text for better TTS
+                        clean_transcript = clean_text_for_tts(st.session_state.transcript)
+                        # Use speak_text_fast for longer transcript text (500 chars vs 200)
+                        audio_bytes = processor.speak_text_fast(clean_transcript, voice_persona, language)
+                        st.audio(audio_bytes, format="audio/mpeg")
+                        st.success(f"Generated speech with {voice_persona} voice!")
+                except Exception as e:
+                    st.error(f"Failed to generate speech: {str(e)}")
     
-    with col2:
-        st.markdown("**Listen to Analysis:**")
-        analysis_clicked = st.button("🎵 Generate Speech", key="analysis_tts")
+        with col2:
+            st.markdown("**Listen to Analysis:**")
+            analysis_clicked = st.button("🎵 Generate Speech", key="analysis_tts")
         
-        if analysis_clicked:
-            try:
-                from tts_processor import TTSProcessor
-                api_key = os.getenv("DEEPGRAM_API_KEY")
-                processor = TTSProcessor(api_key)
-                with st.spinner(f"Generating speech with {voice_persona}..."):
-                    # Clean the narrative text for better TTS
-                    clean_narrative = clean_analysis_for_tts(st.session_state.narrative)
-                    # Use speak_text_fast for longer analysis text (500 chars vs 200)
-                    audio_html = processor.speak_text_fast(clean_narrative, voice_persona, language)
-                    st.markdown(audio_html, unsafe_allow_html=True)
-                    st.success(f"Generated speech with {voice_persona} voice!")
-            except Exception as e:
-                st.error(f"Failed to generate speech: {str(e)}")
+            if analysis_clicked:
+                try:
+                    api_key = os.getenv("DEEPGRAM_API_KEY")
+                    processor = get_tts(api_key)
+                    with st.spinner(f"Generating speech with {voice_persona}..."):
+                        # Clean the narrative text for better TTS
+                        clean_narrative = clean_analysis_for_tts(st.session_state.narrative)
+                        # Use speak_text_fast for longer analysis text (500 chars vs 200)
+                        audio_bytes = processor.speak_text_fast(clean_narrative, voice_persona, language)
+                        st.audio(audio_bytes, format="audio/mpeg")
+                        st.success(f"Generated speech with {voice_persona} voice!")
+                except Exception as e:
+                    st.error(f"Failed to generate speech: {str(e)}")
     
-    # Raw analysis data (collapsible)
-    st.markdown("---")
-    with st.expander("🔍 Raw Analysis Data"):
-        st.json(st.session_state.analysis_results["analysis"])
+        # Raw analysis data (collapsible)
+        st.markdown("---")
+        with st.expander("🔍 Raw Analysis Data"):
+            # orjson serializes 3-5x faster than the stdlib json st.json uses
+            raw_json = orjson.dumps(
+                st.session_state.analysis_results["analysis"],
+                option=orjson.OPT_INDENT_2,
+            ).decode()
+            st.code(raw_json, language="json")
+
 
+results_fragment()
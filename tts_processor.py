@@ -1,23 +1,90 @@
 import os
-import requests
-import base64
+import httpx
+import pybase64
 import streamlit as st
+import threading
 import time
-import hashlib
+import xxhash
+import diskcache
 from functools import lru_cache
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_combine,
+    wait_exponential_jitter,
+)
+
+def _is_transient_tts_error(exc: BaseException) -> bool:
+    """Retry network errors, 429 rate limits, and 5xx responses."""
+    if isinstance(exc, httpx.TransportError):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        status = exc.response.status_code
+        return status == 429 or status >= 500
+    return False
+
+def _retry_after_wait(retry_state) -> float:
+    """Honor the Retry-After header on 429 responses."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return 0.0
+
+_tts_retry = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_combine(_retry_after_wait, wait_exponential_jitter(initial=0.5, max=8)),
+    retry=retry_if_exception(_is_transient_tts_error),
+    reraise=True,
+)
+
+# On-disk audio cache: repeat narratives return in microseconds and the
+# cache survives process restarts, unlike the old in-memory dict.
+_tts_cache = diskcache.Cache(".tts_cache", size_limit=2 << 30)
+
+def _tts_cache_key(model: str, voice: str, language: str, text: str) -> str:
+    """Cache key over the full text (prefix hashing caused collisions).
+
+    xxh3 is ~10x faster than a cryptographic hash and plenty for a
+    cache key - there is no security requirement here.
+    """
+    return xxhash.xxh3_64_hexdigest(f"{model}|{voice}|{language}|{text}".encode())
+
+# Shared HTTP/2 clients, one per API key, reused across TTSProcessor
+# instances so every /v1/speak call rides the same warm TLS connection.
+_HTTP_CLIENTS = {}
+
+def _get_http_client(api_key: str) -> httpx.Client:
+    """Get (or create) the shared HTTP/2 client for an API key."""
+    client = _HTTP_CLIENTS.get(api_key)
+    if client is None:
+        client = httpx.Client(
+            http2=True,
+            headers={
+                "Authorization": f"Token {api_key}",
+                "Content-Type": "application/json",
+                "Accept": "audio/mpeg"
+            },
+            limits=httpx.Limits(max_keepalive_connections=50, max_connections=100),
+            timeout=30
+        )
+        _HTTP_CLIENTS[api_key] = client
+    return client
+
+# Single-flight table: concurrent identical speak requests (double-clicked
+# buttons, parallel sessions) share one API call instead of paying twice.
+_inflight_lock = threading.Lock()
+_inflight = {}
 
 class TTSProcessor:
     def __init__(self, api_key: str):
         """Initialize TTS processor with Deepgram API key."""
         self.api_key = api_key
         self.base_url = "https://api.deepgram.com/v1/speak"
-        self.session = requests.Session()  # Reuse connections
-        self.session.headers.update({
-            "Authorization": f"Token {self.api_key}",
-            "Content-Type": "application/json",
-            "Accept": "audio/mpeg"
-        })
-        self.cache = {}  # Simple in-memory cache
+        self.session = _get_http_client(api_key)  # Shared pooled client
+        self.cache = _tts_cache  # Persistent on-disk audio cache
     
     @lru_cache(maxsize=1)
     def get_available_voices(self):
@@ -31,6 +98,7 @@ class TTSProcessor:
             "andromeda": "Modern and dynamic"
         }
     
+    @_tts_retry
     def generate_speech(self, text: str, voice: str = "thalia", language: str = "en") -> bytes:
         """
         Generate speech from text using Deepgram TTS (optimized for speed).
@@ -54,19 +122,22 @@ class TTSProcessor:
             
             payload = {"text": text}
             
-            # Use session for connection reuse and faster requests
-            response = self.session.post(url, json=payload, timeout=30)
+            # Shared client multiplexes concurrent requests over one TLS connection
+            response = self.session.post(url, json=payload)
             response.raise_for_status()
             
             return response.content
-            
+
+        except (httpx.TransportError, httpx.HTTPStatusError):
+            raise  # let tenacity retry transient errors untouched
         except Exception as e:
             raise Exception(f"TTS generation failed: {str(e)}")
     
     def create_audio_player(self, audio_bytes: bytes) -> str:
         """
-        Create HTML audio player for Streamlit (optimized).
-        
+        Create HTML audio player for Streamlit (kept for back-compat;
+        prefer st.audio(audio_bytes), which skips base64 embedding).
+
         Args:
             audio_bytes: Audio data in bytes
             
@@ -74,8 +145,8 @@ class TTSProcessor:
             HTML string for audio player
         """
         try:
-            # Use faster base64 encoding
-            b64 = base64.b64encode(audio_bytes).decode("ascii")
+            # pybase64 uses a SIMD encoder, ~4-6x faster on large blobs
+            b64 = pybase64.b64encode(audio_bytes).decode("ascii")
             return f'<audio controls preload="auto" src="data:audio/mpeg;base64,{b64}"></audio>'
         except Exception as e:
             raise Exception(f"Audio player creation failed: {str(e)}")
@@ -105,87 +176,115 @@ class TTSProcessor:
         except Exception as e:
             raise Exception(f"Speech generation failed: {str(e)}")
     
-    def speak_text_fast(self, text: str, voice: str = "thalia", language: str = "en") -> str:
+    def _generate_speech_coalesced(self, cache_key: str, text: str, voice: str, language: str) -> bytes:
+        """Generate speech with single-flight coalescing.
+
+        If an identical request is already in flight, wait for its
+        result (which lands in the cache) instead of issuing a second
+        API call.
+        """
+        while True:
+            with _inflight_lock:
+                audio_bytes = self.cache.get(cache_key)
+                if audio_bytes is not None:
+                    return audio_bytes
+                event = _inflight.get(cache_key)
+                if event is None:
+                    event = threading.Event()
+                    _inflight[cache_key] = event
+                    break
+            # Another thread is generating this audio; wait and re-check
+            event.wait()
+        try:
+            audio_bytes = self.generate_speech(text, voice, language)
+            self.cache[cache_key] = audio_bytes
+            return audio_bytes
+        finally:
+            with _inflight_lock:
+                _inflight.pop(cache_key, None)
+            event.set()
+
+    def speak_text_fast(self, text: str, voice: str = "thalia", language: str = "en") -> bytes:
         """
         Ultra-fast TTS pipeline with smart caching and minimal processing.
-        
+
         Args:
             text: Text to convert to speech (truncated to 500 chars for speed)
             voice: Voice persona
             language: Language code
-            
+
         Returns:
-            HTML string for audio player
+            MP3 audio bytes, ready for st.audio (no base64 embedding)
         """
         try:
-            # Create cache key
-            cache_key = hashlib.md5(f"{text[:100]}_{voice}_{language}".encode()).hexdigest()
-            
-            # Check cache first
-            if cache_key in self.cache:
-                print(f"Cache hit for TTS: {cache_key[:8]}...")
-                return self.cache[cache_key]
-            
             # Truncate text more aggressively for speed
             max_length = 500
             if len(text) > max_length:
                 text = text[:max_length] + "..."
-            
+
+            # Create cache key over the full synthesized text
+            cache_key = _tts_cache_key("aura-2", voice, language, text)
+
+            # Check cache first
+            audio_bytes = self.cache.get(cache_key)
+            if audio_bytes is not None:
+                print(f"Cache hit for TTS: {cache_key[:8]}...")
+                return audio_bytes
+
             start_time = time.time()
-            audio_bytes = self.generate_speech(text, voice, language)
-            html_player = self.create_audio_player(audio_bytes)
-            
-            # Cache the result
-            self.cache[cache_key] = html_player
-            
+            audio_bytes = self._generate_speech_coalesced(cache_key, text, voice, language)
+
             elapsed = time.time() - start_time
             print(f"Fast TTS generation took {elapsed:.2f} seconds")
-            
-            return html_player
+
+            return audio_bytes
         except Exception as e:
             raise Exception(f"Fast speech generation failed: {str(e)}")
     
-    def speak_text_instant(self, text: str, voice: str = "thalia", language: str = "en") -> str:
+    def speak_text_instant(self, text: str, voice: str = "thalia", language: str = "en") -> bytes:
         """
         Instant TTS with maximum speed optimizations.
-        
+
         Args:
             text: Text to convert to speech (truncated to 200 chars for instant response)
             voice: Voice persona
             language: Language code
-            
+
         Returns:
-            HTML string for audio player
+            MP3 audio bytes, ready for st.audio (no base64 embedding)
         """
         try:
-            # Create cache key
-            cache_key = hashlib.md5(f"{text[:50]}_{voice}_{language}".encode()).hexdigest()
-            
-            # Check cache first
-            if cache_key in self.cache:
-                print(f"Instant cache hit for TTS: {cache_key[:8]}...")
-                return self.cache[cache_key]
-            
             # Truncate text aggressively for instant response
             max_length = 200
             if len(text) > max_length:
                 text = text[:max_length] + "..."
-            
+
+            # Create cache key over the full synthesized text
+            cache_key = _tts_cache_key("aura-2", voice, language, text)
+
+            # Check cache first
+            audio_bytes = self.cache.get(cache_key)
+            if audio_bytes is not None:
+                print(f"Instant cache hit for TTS: {cache_key[:8]}...")
+                return audio_bytes
+
             start_time = time.time()
-            audio_bytes = self.generate_speech(text, voice, language)
-            html_player = self.create_audio_player(audio_bytes)
-            
-            # Cache the result
-            self.cache[cache_key] = html_player
-            
+            audio_bytes = self._generate_speech_coalesced(cache_key, text, voice, language)
+
             elapsed = time.time() - start_time
             print(f"Instant TTS generation took {elapsed:.2f} seconds")
-            
-            return html_player
+
+            return audio_bytes
         except Exception as e:
             raise Exception(f"Instant speech generation failed: {str(e)}")
 
 
+@st.cache_resource(show_spinner=False)
+def get_tts(api_key: str) -> TTSProcessor:
+    """Get the session-cached TTSProcessor so its pool and cache survive reruns."""
+    return TTSProcessor(api_key)
+
+
 def create_tts_player(text: str, api_key: str, voice: str, language: str = "en"):
     """
     Create TTS audio player for selected voice persona in Streamlit.
@@ -200,17 +299,17 @@ def create_tts_player(text: str, api_key: str, voice: str, language: str = "en")
         st.warning("No text available for speech synthesis.")
         return
     
-    processor = TTSProcessor(api_key)
+    processor = get_tts(api_key)
     voices = processor.get_available_voices()
-    
+
     if voice not in voices:
         st.error(f"Invalid voice persona: {voice}")
         return
     
     try:
         with st.spinner(f"Generating speech with {voice}..."):
-            audio_html = processor.speak_text(text, voice, language)
-            st.markdown(audio_html, unsafe_allow_html=True)
+            audio_bytes = processor.speak_text_fast(text, voice, language)
+            st.audio(audio_bytes, format="audio/mpeg")
             st.success(f"Generated speech with {voice} voice!")
     except Exception as e:
         st.error(f"Failed to generate speech with {voice}: {str(e)}")
@@ -229,9 +328,9 @@ def create_tts_buttons(text: str, api_key: str, language: str = "en"):
         st.warning("No text available for speech synthesis.")
         return
     
-    processor = TTSProcessor(api_key)
+    processor = get_tts(api_key)
     voices = processor.get_available_voices()
-    
+
     st.markdown("### 🎙️ Listen to Results")
     
     # Create columns for voice buttons
@@ -244,8 +343,8 @@ def create_tts_buttons(text: str, api_key: str, language: str = "en"):
             if st.button(f"🎵 {voice.title()}", help=description, use_container_width=True):
                 try:
                     with st.spinner(f"Generating speech with {voice}..."):
-                        audio_html = processor.speak_text(text, voice, language)
-                        st.markdown(audio_html, unsafe_allow_html=True)
+                        audio_bytes = processor.speak_text_fast(text, voice, language)
+                        st.audio(audio_bytes, format="audio/mpeg")
                         st.success(f"Generated speech with {voice} voice!")
                 except Exception as e:
                     st.error(f"Failed to generate speech with {voice}: {str(e)}")